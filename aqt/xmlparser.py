@@ -19,10 +19,22 @@
 # IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
 # CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
-from dataclasses import dataclass
-from typing import Dict, Iterable, List, Optional
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+from xml.parsers import expat
 
-from defusedxml import ElementTree
+_TRUE = frozenset({"true", "True", "TRUE", "1"})
+
+# Dataclass slots support arrived in Python 3.10; it drops the per-instance
+# __dict__ from Updates (PackageUpdate is a NamedTuple and already compact)
+# and turns attribute typos into errors.
+if sys.version_info >= (3, 10):
+    _slots: Dict[str, bool] = {"slots": True}
+else:  # pragma: no-cover
+    _slots = {}
 
 
 class ModuleToPackage:
@@ -45,22 +57,29 @@ class ModuleToPackage:
     """
 
     def __init__(self, initial_map: Dict[str, List[str]]):
-        self._modules_to_packages: Dict[str, List[str]] = initial_map
+        # Copy the buckets so add() can grow them in place without
+        # mutating the caller's lists.
+        self._modules_to_packages: Dict[str, List[str]] = {k: list(v) for k, v in initial_map.items()}
         self._packages_to_modules: Dict[str, str] = {
             value: key for key, list_of_values in initial_map.items() for value in list_of_values
         }
+        self._sorted_keys: Optional[List[str]] = None
 
     def add(self, module_name: str, package_names: List[str]):
-        self._modules_to_packages[module_name] = self._modules_to_packages.get(module_name, []) + package_names
+        bucket = self._modules_to_packages.setdefault(module_name, [])
+        bucket.extend(package_names)
         for package_name in package_names:
-            assert package_name not in self._packages_to_modules, "Detected a package name collision"
+            if package_name in self._packages_to_modules:
+                raise ValueError(f"Detected a package name collision: {package_name}")
             self._packages_to_modules[package_name] = module_name
+        self._sorted_keys = None
 
     def remove_module_for_package(self, package_name: str):
         module_name = self._packages_to_modules[package_name]
         for package_name in self._modules_to_packages[module_name]:
             self._packages_to_modules.pop(package_name)
         self._modules_to_packages.pop(module_name)
+        self._sorted_keys = None
 
     def has_package(self, package_name: str):
         return package_name in self._packages_to_modules
@@ -72,114 +91,199 @@ class ModuleToPackage:
         return len(self._modules_to_packages)
 
     def __format__(self, format_spec) -> str:
-        return str(sorted(set(self._modules_to_packages.keys())))
+        # Dict keys are already unique; cache the sort until the next mutation.
+        if self._sorted_keys is None:
+            self._sorted_keys = sorted(self._modules_to_packages.keys())
+        return str(self._sorted_keys)
 
 
-@dataclass
-class PackageUpdate:
+class PackageUpdate(NamedTuple):
+    # A NamedTuple rather than a dataclass: construction runs in C, which
+    # matters when thousands of instances are built per parse, and it is
+    # as compact as a slotted frozen dataclass.
     name: str
     display_name: str
     description: str
     release_date: str
     version: str
     dependencies: List[str]
-    auto_dependon: Optional[List[str]]
-    downloadable_archives: Optional[List[str]]
+    auto_dependon: List[str]
+    downloadable_archives: List[str]
     default: bool
     virtual: bool
 
 
-@dataclass(init=False)
+@dataclass(init=False, **_slots)
 class Updates:
     application_name: str
     application_version: str
     package_updates: List[PackageUpdate]
+    _by_name: Dict[str, PackageUpdate] = field(repr=False, compare=False)
+    _by_arch: Dict[str, Tuple[PackageUpdate, ...]] = field(repr=False, compare=False)
+    _dfs_cache: Dict[str, List[str]] = field(repr=False, compare=False)
+    _idx: Dict[str, int] = field(repr=False, compare=False)
 
     def __init__(self):
         self.package_updates = []
+        self._by_name: Dict[str, PackageUpdate] = {}
+        self._by_arch: Dict[str, Tuple[PackageUpdate, ...]] = {}
+        self._dfs_cache: Dict[str, List[str]] = {}
+        self._idx: Dict[str, int] = {}
 
     def extend(self, other):
+        base = len(self.package_updates)
+        for position, pu in enumerate(other.package_updates, base):
+            self._idx[pu.name] = position
         self.package_updates.extend(other.package_updates)
+        self._by_name.update(other._by_name)
+        for arch, updates in other._by_arch.items():
+            self._by_arch[arch] = self._by_arch.get(arch, ()) + updates
+        # New packages can change reachability; throw away memoized walks.
+        self._dfs_cache.clear()
 
     @classmethod
-    def fromstring(cls, update_xml_text: str):
+    def fromstring(cls, update_xml_text: Union[str, bytes]):
         self = cls()
-        update_xml = ElementTree.fromstring(update_xml_text)
-        self.application_name = update_xml.find("ApplicationName").text
-        self.application_version = update_xml.find("ApplicationVersion").text
-        for packageupdate in update_xml.iter("PackageUpdate"):
-            pkg_name = self._get_text(packageupdate.find("Name"))
-            display_name = self._get_text(packageupdate.find("DisplayName"))
-            full_version = self._get_text(packageupdate.find("Version"))
-            package_desc = self._get_text(packageupdate.find("Description"))
-            release_date = self._get_text(packageupdate.find("ReleaseDate"))
-            dependencies = self._get_list(packageupdate.find("Dependencies"))
-            auto_dependon = self._get_list(packageupdate.find("AutoDependOn"))
-            archives = self._get_list(packageupdate.find("DownloadableArchives"))
-            default = self._get_boolean(packageupdate.find("Default"))
-            virtual = self._get_boolean(packageupdate.find("Virtual"))
-            self.package_updates.append(
-                PackageUpdate(
-                    pkg_name,
-                    display_name,
-                    package_desc,
-                    release_date,
-                    full_version,
-                    dependencies,
-                    auto_dependon,
-                    archives,
-                    default,
-                    virtual,
+        # SAX-style parse with expat: PackageUpdate dataclasses are built
+        # directly from the event stream, so no intermediate Element objects
+        # are allocated and memory stays bounded by one PackageUpdate.
+        parser = expat.ParserCreate()
+        parser.buffer_text = True
+        current: Optional[Dict[str, str]] = None
+        buf: List[str] = []
+        # Bind the field helpers once; the handlers then reach them through
+        # the closure instead of a global or method lookup per call.
+        get_text = _get_text
+        get_list = _get_list
+        get_boolean = _get_boolean
+
+        def forbid_dtd(*args):
+            # A DTD enables entity-expansion attacks; Updates.xml never has one.
+            raise ValueError("DTD declarations are forbidden in Updates.xml")
+
+        def start_element(tag, attrs):
+            nonlocal current
+            del buf[:]
+            if tag == "PackageUpdate":
+                current = {}
+
+        def char_data(data):
+            buf.append(data)
+
+        def end_element(tag):
+            nonlocal current
+            if tag == "PackageUpdate":
+                fields = current
+                current = None
+                self.package_updates.append(
+                    PackageUpdate(
+                        # Names repeat heavily across the file; interning
+                        # dedups them and makes later == checks pointer fast.
+                        sys.intern(get_text(fields.get("Name"))),
+                        get_text(fields.get("DisplayName")),
+                        get_text(fields.get("Description")),
+                        get_text(fields.get("ReleaseDate")),
+                        get_text(fields.get("Version")),
+                        get_list(fields.get("Dependencies")),
+                        get_list(fields.get("AutoDependOn")),
+                        get_list(fields.get("DownloadableArchives")),
+                        get_boolean(fields.get("Default")),
+                        get_boolean(fields.get("Virtual")),
+                    )
                 )
-            )
+            elif current is not None:
+                current[tag] = "".join(buf)
+            elif tag == "ApplicationName":
+                self.application_name = "".join(buf)
+            elif tag == "ApplicationVersion":
+                self.application_version = "".join(buf)
+
+        parser.StartDoctypeDeclHandler = forbid_dtd
+        parser.StartElementHandler = start_element
+        parser.CharacterDataHandler = char_data
+        parser.EndElementHandler = end_element
+        parser.Parse(update_xml_text, True)
+        self._by_name = {pu.name: pu for pu in self.package_updates}
+        self._idx = {pu.name: position for position, pu in enumerate(self.package_updates)}
+        by_arch: Dict[str, List[PackageUpdate]] = {}
+        for pu in self.package_updates:
+            arch = pu.name.rsplit(".", 1)[-1]
+            by_arch.setdefault(arch, []).append(pu)
+        self._by_arch = {arch: tuple(updates) for arch, updates in by_arch.items()}
         return self
 
+    @classmethod
+    def fromstrings(cls, xmls: Iterable[Union[str, bytes]]) -> List["Updates"]:
+        """Parse several Updates.xml documents in parallel worker processes.
+
+        The expat handlers are Python callbacks and hold the GIL for the
+        whole parse, so threads would serialize; processes actually overlap.
+        """
+        with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+            return list(executor.map(cls.fromstring, xmls))
+
     def get(self):
         return self.package_updates
 
     def get_from_arch(self, arch: str):
+        found = self._by_arch.get(arch)
+        if found:
+            return found
+        # The index only covers whole final name segments; an arch that is a
+        # partial or dotted suffix falls back to the endswith scan.
         result = []
         for update in self.package_updates:
             if update.name.endswith(arch):
                 result.append(update)
         return result
 
-    def dfs(self, target:str):
+    def dfs(self, target: str):
+        if target in self._dfs_cache:
+            return self._dfs_cache[target]
         # initialize
         filo = [target]
         packages = []
-        visited = []
+        # One byte per package: cheaper to probe than a set of name strings.
+        # Names outside the index (unresolvable dependencies) have no slot
+        # and are passed through untracked, as before.
+        visited = bytearray(len(self.package_updates))
+        idx_of = self._idx
         # dfs look-up
         while len(filo) > 0:
             next = filo.pop()
+            idx = idx_of.get(next)
+            if idx is not None:
+                if visited[idx]:
+                    continue
+                visited[idx] = 1
             packages.append(next)
-            for entry in self.package_updates:
-                if entry.name == next:
-                    visited.append(next)
-                    for depend in entry.dependencies:
-                        if depend not in visited:
-                            filo.append(depend)
+            entry = self._by_name.get(next)
+            if entry is not None:
+                for depend in entry.dependencies:
+                    depend_idx = idx_of.get(depend)
+                    if depend_idx is None or not visited[depend_idx]:
+                        filo.append(depend)
+        self._dfs_cache[target] = packages
         return packages
 
-    def _get_text(self, item):
-        if item is not None and item.text is not None:
-            return item.text
-        else:
-            return ""
 
-    def _get_list(self, item):
-        if item is not None and item.text is not None:
-            return ssplit(item.text)
-        else:
-            return None
+def _get_text(item: Optional[str]) -> str:
+    if item is not None:
+        return item
+    else:
+        return ""
+
+
+def _get_list(item: Optional[str]) -> List[str]:
+    if item:
+        return ssplit(item)
+    else:
+        return []
+
 
-    def _get_boolean(self, item):
-        if "true" == item:
-            return True
-        else:
-            return False
+def _get_boolean(item: Optional[str]) -> bool:
+    return item is not None and item.strip() in _TRUE
 
 
-def ssplit(data: str):
-    for element in data.split(","):
-        yield element.strip()
+def ssplit(data: str) -> List[str]:
+    return [sys.intern(element.strip()) for element in data.split(",")]
@@ -27,20 +27,23 @@ def test_parse_updates(in_file: str, expect_out_file: str):
                     assert entry.version == expect["Version"]
                     assert entry.release_date == expect["ReleaseDate"]
                     assert entry.description == expect["Description"]
-                    count = 0
-                    for item in entry.downloadable_archives:
-                        count += 1
-                        assert item in expect["DownloadableArchives"]
-                    assert count == len(expect["DownloadableArchives"])
-                    count = 0
-                    for item in entry.auto_dependon:
-                        count += 1
-                        assert item in expect["AutoDependOn"]
-                    assert count == len(expect["AutoDependOn"])
+                    assert set(entry.downloadable_archives) == set(expect["DownloadableArchives"])
+                    assert set(entry.auto_dependon) == set(expect["AutoDependOn"])
+                    assert entry.virtual == (expect["Virtual"] == "true")
+                    assert entry.default == (expect.get("Default") == "true")
                     for item in entry.dependencies:
                         assert item in [ expect["Dependencies"] ]
 
 
+def test_parse_updates_parallel():
+    in_files = ["windows-5140-update.xml", "windows-622-android-update.xml"]
+    xmls = [(Path(__file__).parent / "data" / in_file).read_text("utf-8") for in_file in in_files]
+    all_updates = xmlparser.Updates.fromstrings(xmls)
+    assert len(all_updates) == len(in_files)
+    for xml, updates in zip(xmls, all_updates):
+        assert updates.package_updates == xmlparser.Updates.fromstring(xml).package_updates
+
+
 @pytest.mark.parametrize(
     ("target,in_file,expect"),
     [